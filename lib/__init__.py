@@ -0,0 +1,2 @@
+# lib/__init__.py
+"""Funções auxiliares do MiudinhoAI, usadas pelas abas do app.py."""
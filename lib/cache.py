@@ -0,0 +1,74 @@
+# lib/cache.py
+"""
+Cache persistente em disco (SQLite), compartilhado por todas as sessões.
+
+Sobrevive a reinicializações do Streamlit Cloud, ao contrário de st.cache_data.
+Cada tabela guarda pares (chave, valor) com o horário da gravação, usado para
+aplicar o TTL na leitura.
+"""
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from lib.config import CACHE_DB_FILE
+
+CACHE_TABLES = ('transcricoes', 'embeddings', 'analises', 'expansoes')
+
+# A mesma conexão é usada pela thread do script e pela thread do event loop
+_lock = threading.Lock()
+
+# Sem spinner: o cache de embeddings é consultado dentro de corrotinas, fora da thread do script
+@st.cache_resource(show_spinner=False)
+def get_cache_connection():
+    """Abre (uma única vez) a conexão com o banco de cache e cria as tabelas."""
+    conn = sqlite3.connect(CACHE_DB_FILE, check_same_thread=False)
+    for table in CACHE_TABLES:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (chave TEXT PRIMARY KEY, valor BLOB, ts INTEGER)")
+    conn.commit()
+    return conn
+
+def ler_cache(tabela, chaves, ttl):
+    """Retorna {chave: valor} com as chaves encontradas e ainda dentro do TTL (em segundos)."""
+    chaves = list(chaves)
+    if not chaves:
+        return {}
+    placeholders = ", ".join("?" * len(chaves))
+    limite = int(time.time()) - ttl
+    with _lock:
+        rows = get_cache_connection().execute(
+            f"SELECT chave, valor FROM {tabela} WHERE chave IN ({placeholders}) AND ts >= ?",
+            (*chaves, limite)
+        ).fetchall()
+    return dict(rows)
+
+def chaves_em_cache(tabela, ttl):
+    """Retorna o conjunto das chaves ainda dentro do TTL, sem carregar os valores."""
+    limite = int(time.time()) - ttl
+    with _lock:
+        rows = get_cache_connection().execute(
+            f"SELECT chave FROM {tabela} WHERE ts >= ?", (limite,)
+        ).fetchall()
+    return {chave for (chave,) in rows}
+
+def gravar_cache(tabela, itens):
+    """Grava (ou substitui) os pares {chave: valor} na tabela."""
+    agora = int(time.time())
+    with _lock:
+        conn = get_cache_connection()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {tabela} (chave, valor, ts) VALUES (?, ?, ?)",
+            [(chave, valor, agora) for chave, valor in itens.items()]
+        )
+        conn.commit()
+
+def limitar_cache(tabela, max_entradas):
+    """Remove as entradas mais antigas da tabela, mantendo no máximo max_entradas."""
+    with _lock:
+        conn = get_cache_connection()
+        conn.execute(
+            f"DELETE FROM {tabela} WHERE chave NOT IN (SELECT chave FROM {tabela} ORDER BY ts DESC LIMIT ?)",
+            (max_entradas,)
+        )
+        conn.commit()
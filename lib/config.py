@@ -0,0 +1,43 @@
+# lib/config.py
+"""Arquivos, modelos e parâmetros do MiudinhoAI (centralizados)."""
+
+# --- MODELOS GEMINI ---
+GENERATIVE_MODEL_NAME = 'gemini-2.5-flash'
+EMBEDDING_MODEL = 'models/text-embedding-004'
+GEMINI_MAX_CONCURRENCY = 4    # chamadas simultâneas ao Gemini em processamentos em lote
+
+# --- PREPARO DA PERGUNTA (ABA DE BUSCA) ---
+# False: HyDE (uma resposta hipotética, um único vetor na busca)
+# True: expansão em várias variações da pergunta (um vetor e uma busca por variação)
+USE_QUERY_EXPANSION = False
+HYDE_MAX_WORDS = 120          # tamanho máximo da resposta hipotética do HyDE
+
+# --- CACHE EM DISCO ---
+CACHE_DB_FILE = 'cache_miudinho.sqlite'
+EMBEDDING_CACHE_TTL = 30 * 24 * 3600  # 30 dias, em segundos
+EMBEDDING_CACHE_MAX_ENTRIES = 10000    # ~3 KB por vetor: limita o banco a ~30 MB
+EXPANSION_CACHE_TTL = 24 * 3600       # 1 dia: variações geradas para uma pergunta
+EXPANSION_CACHE_MAX_ENTRIES = 512
+
+# --- BANCO VETORIAL (ABA DE BUSCA) ---
+FAISS_INDEX_FILE = 'banco_vetorial_gemini_txt_900.index'
+CHUNKS_MAPPING_FILE = 'chunks_mapeamento_gemini_txt_900.pkl'
+CHUNKS_ARROW_FILE = 'chunks_mapeamento_gemini_txt_900.arrow'  # gerado por scripts/converter_metadados.py
+FAISS_MAX_THREADS = 4    # threads OpenMP na busca (a busca plana escala mal além disso)
+# Parâmetros de busca aplicados via faiss.ParameterSpace (os que não se aplicam ao índice são ignorados)
+FAISS_SEARCH_PARAMS = {
+    'nprobe': 16,              # listas visitadas por busca em índices IVF
+    'efSearch': 64,            # largura da busca em índices HNSW
+    'quantizer_efSearch': 64,  # largura da busca no quantizador HNSW de índices IVF_HNSW
+}
+
+# --- VÍDEOS E TRANSCRIÇÕES (ABA DE ANÁLISE) ---
+VIDEO_JSON_FILE = 'videos_miudinho_uberaba.json'
+PROMPTS_DIR = 'prompts'
+ANALYSIS_TEMPERATURE = 0.2
+TRANSCRIPT_SUMMARY_THRESHOLD_CHARS = 80000  # ~20 mil tokens: acima disso a transcrição é resumida por partes
+TRANSCRIPT_MAX_CHARS = 40000  # tamanho de cada parte no resumo por partes
+TRANSCRIPT_MAX_TOKENS = 60000  # teto do texto enviado na análise; acima disso o trecho central é omitido
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600  # 7 dias, em segundos
+TRANSCRIPT_PREFETCH_WORKERS = 8       # downloads simultâneos ao pré-aquecer o cache
+ANALYSIS_CACHE_TTL = 3600             # 1 hora: análises geradas são reaproveitadas neste período
@@ -0,0 +1,31 @@
+# lib/gemini.py
+"""Acesso compartilhado aos modelos do Gemini e execução das chamadas assíncronas."""
+import asyncio
+import threading
+
+import google.generativeai as genai
+import streamlit as st
+
+from lib.config import GENERATIVE_MODEL_NAME
+
+# show_spinner=False: as corrotinas chamam esta função na thread do event loop, que não tem sessão para exibir o spinner
+@st.cache_resource(show_spinner=False)
+def get_model(name=GENERATIVE_MODEL_NAME):
+    """Cria (uma única vez por nome) o GenerativeModel, reaproveitado entre reruns e sessões."""
+    return genai.GenerativeModel(name)
+
+@st.cache_resource
+def get_event_loop():
+    """
+    Cria (uma única vez) um event loop permanente em uma thread de fundo.
+    Os clientes assíncronos do Gemini ficam presos ao loop em que foram criados,
+    então todas as chamadas assíncronas precisam rodar sempre no mesmo loop
+    (com asyncio.run, a partir da segunda chamada surge "Event loop is closed").
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_async(coro):
+    """Executa uma corrotina no event loop permanente e espera pelo resultado."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
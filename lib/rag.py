@@ -0,0 +1,362 @@
+# lib/rag.py
+"""Busca em todo o acervo (RAG): índice FAISS, expansão da pergunta e resposta com citações."""
+import asyncio
+import hashlib
+import os
+import pickle
+import re
+
+import faiss
+import google.generativeai as genai
+import numpy as np
+import orjson
+import pyarrow as pa
+import streamlit as st
+
+from lib.config import (
+    CHUNKS_ARROW_FILE,
+    CHUNKS_MAPPING_FILE,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL,
+    EMBEDDING_MODEL,
+    EXPANSION_CACHE_MAX_ENTRIES,
+    EXPANSION_CACHE_TTL,
+    FAISS_INDEX_FILE,
+    FAISS_MAX_THREADS,
+    FAISS_SEARCH_PARAMS,
+    HYDE_MAX_WORDS,
+    USE_QUERY_EXPANSION,
+)
+from lib.cache import gravar_cache, ler_cache, limitar_cache
+from lib.gemini import get_model
+
+# O Streamlit Cloud costuma iniciar com OMP_NUM_THREADS=1. Por outro lado, a busca plana
+# paraleliza pelas perguntas e cada thread percorre o índice inteiro, então o ganho
+# para de crescer depois de poucas threads: usa os núcleos disponíveis, até FAISS_MAX_THREADS.
+faiss.omp_set_num_threads(max(1, min(FAISS_MAX_THREADS, os.cpu_count() or 1)))
+
+def ajustar_parametros_de_busca(index):
+    """Aplica os parâmetros de busca que o tipo do índice suporta (índices planos não têm nenhum)."""
+    parameter_space = faiss.ParameterSpace()
+    for name, value in FAISS_SEARCH_PARAMS.items():
+        try:
+            parameter_space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            # O parâmetro não se aplica a este tipo de índice
+            pass
+
+class ArrowChunkMetadata:
+    """
+    Metadados dos chunks guardados em uma tabela Arrow mapeada em memória.
+    metadata[idx] devolve o mesmo dicionário ({'source_file': ..., 'text': ...})
+    da versão em pickle, mas só converte para objetos Python a linha pedida.
+    Com um array NumPy de índices, devolve a lista de dicionários dessas linhas
+    (um único take vetorizado), como o fancy indexing da versão em pickle.
+    """
+
+    def __init__(self, table):
+        self._table = table
+        self._columns = dict(zip(table.column_names, table.columns))
+
+    def __len__(self):
+        return self._table.num_rows
+
+    def __getitem__(self, idx):
+        if isinstance(idx, np.ndarray):
+            return self._table.take(idx).to_pylist()
+        return {name: column[idx].as_py() for name, column in self._columns.items()}
+
+def load_chunk_metadata():
+    """Carrega os metadados dos chunks: Arrow via memory-map, se disponível; senão, o pickle."""
+    if os.path.exists(CHUNKS_ARROW_FILE):
+        table = pa.ipc.open_file(pa.memory_map(CHUNKS_ARROW_FILE)).read_all()
+        return ArrowChunkMetadata(table)
+    with open(CHUNKS_MAPPING_FILE, 'rb') as f:
+        # Array de objetos: permite buscar vários chunks de uma vez com metadata[array_de_indices]
+        return np.array(pickle.load(f), dtype=object)
+
+def ler_indice_faiss(path):
+    """
+    Lê o índice FAISS via memory-map, somente leitura: os vetores não são copiados para a
+    memória do processo e o cache de páginas do sistema mantém em RAM apenas o que é usado.
+    Versões do FAISS sem suporte a mmap para o tipo do índice fazem a leitura completa.
+    """
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+@st.cache_resource
+def get_gpu_resources():
+    """Cria (uma única vez) os recursos de GPU do FAISS, reaproveitados entre as buscas."""
+    return faiss.StandardGpuResources()
+
+def mover_para_gpu(index):
+    """Migra o índice para a GPU quando houver uma (faiss-gpu); caso contrário, devolve o próprio índice."""
+    # O faiss-cpu (usado no Streamlit Cloud) não tem StandardGpuResources
+    if not hasattr(faiss, 'StandardGpuResources') or faiss.get_num_gpus() == 0:
+        return index
+    try:
+        return faiss.index_cpu_to_gpu(get_gpu_resources(), 0, index)
+    except RuntimeError:
+        # Nem todo tipo de índice tem versão em GPU (ex.: HNSW); nesse caso a busca continua na CPU
+        return index
+
+# @st.cache_resource é ideal para carregar modelos, conexões ou dados pesados que não mudam.
+@st.cache_resource
+def carregar_indice_e_metadados():
+    """
+    Lê o índice FAISS e os metadados do disco. Não mostra nada na tela: em caso de erro a exceção
+    é relançada e não fica no cache, então pode rodar na thread de aquecimento.
+    """
+    index = ler_indice_faiss(FAISS_INDEX_FILE)
+    ajustar_parametros_de_busca(index)
+    index = mover_para_gpu(index)
+    metadata = load_chunk_metadata()
+    return index, metadata
+
+def load_faiss_index():
+    """Carrega o índice FAISS e os metadados (do cache) e mostra na tela os erros de carga."""
+    try:
+        return carregar_indice_e_metadados()
+    except FileNotFoundError:
+        st.error(f"ERRO: Arquivos de banco de vetores ('{FAISS_INDEX_FILE}' ou '{CHUNKS_MAPPING_FILE}') não encontrados!")
+    except Exception as e:
+        # Ex.: um ponteiro do Git LFS no lugar do arquivo, ou um pickle/Arrow corrompido
+        st.error(f"ERRO: Não foi possível carregar o banco de vetores: {e}")
+    st.warning("Verifique se os arquivos estão no repositório e se o Git LFS foi usado corretamente.")
+    return None, None
+
+def normalize_query(query):
+    """Normaliza a pergunta para uso como chave de cache (maiúsculas e espaços nas pontas não importam)."""
+    return query.strip().lower()
+
+def deduplicar_perguntas(queries):
+    """
+    Remove perguntas quase idênticas (que só diferem em maiúsculas, pontuação ou espaços),
+    mantendo a primeira ocorrência e a ordem original.
+    """
+    unique = {}
+    for query in queries:
+        unique.setdefault(re.sub(r'\W+', ' ', query.lower()).strip(), query)
+    return list(unique.values())
+
+def _embedding_cache_key(query, task_type):
+    """
+    Chave do cache de embeddings: hash do modelo + tipo de tarefa + texto normalizado
+    (troca de modelo invalida o cache; o mesmo texto embutido como pergunta ou como documento não colide).
+    """
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\n{task_type}\n{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+async def embed_queries_async(queries: list, task_type="RETRIEVAL_QUERY"):
+    """
+    Transforma uma lista de perguntas em uma matriz de vetores (uma linha por pergunta).
+    Vetores já calculados vêm do cache em disco; só as perguntas novas vão para o Gemini.
+    task_type="RETRIEVAL_DOCUMENT" embute os textos no espaço dos chunks indexados (usado pelo HyDE).
+    """
+    keys = [_embedding_cache_key(query, task_type) for query in queries]
+    cached = ler_cache('embeddings', keys, EMBEDDING_CACHE_TTL)
+
+    missing = {key: query for key, query in zip(keys, queries) if key not in cached}
+    if missing:
+        result = await genai.embed_content_async(
+            model=EMBEDDING_MODEL,
+            content=list(missing.values()),
+            task_type=task_type
+        )
+        new_vectors = {
+            key: np.array(vector, dtype=np.float32).tobytes()
+            for key, vector in zip(missing, result['embedding'])
+        }
+        gravar_cache('embeddings', new_vectors)
+        limitar_cache('embeddings', EMBEDDING_CACHE_MAX_ENTRIES)
+        cached.update(new_vectors)
+
+    return np.vstack([np.frombuffer(cached[key], dtype=np.float32) for key in keys])
+
+async def expand_query_with_gemini_async(user_query):
+    """
+    Usa o Gemini para gerar variações de uma pergunta de forma robusta.
+    Retorna uma lista de perguntas, incluindo a original.
+    Variações já geradas para a mesma pergunta (normalizada) vêm do cache em disco.
+    """
+    cache_key = normalize_query(user_query)
+    cached = ler_cache('expansoes', [cache_key], EXPANSION_CACHE_TTL)
+    if cache_key in cached:
+        return [user_query, *orjson.loads(cached[cache_key])]
+
+    try:
+        # PROMPT SIMPLIFICADO: Pede uma lista separada por quebras de linha.
+        prompt = f"""
+        Você é um assistente de busca especialista em teologia e estudos bíblicos.
+        Gere 4 variações da pergunta do usuário para melhorar a busca em uma base de dados de transcrições de vídeos.
+        Concentre-se em sinônimos, conceitos relacionados e formas alternativas de expressar o mesmo significado.
+        
+        Pergunta Original: "{user_query}"
+
+        Retorne APENAS as perguntas geradas. Liste cada pergunta em uma nova linha. NÃO use marcadores, números ou qualquer outra formatação.
+        """
+        
+        response = await get_model().generate_content_async(prompt)
+        
+        # PARSING ROBUSTO: Divide a resposta por quebras de linha.
+        # Usa uma list comprehension para limpar espaços em branco e remover linhas vazias.
+        expanded_queries = [line.strip() for line in response.text.strip().split('\n') if line.strip()]
+
+        # Descarta variações repetidas ou que só repetem a pergunta original (economiza embeddings e buscas)
+        expanded_queries = deduplicar_perguntas([user_query, *expanded_queries])[1:]
+
+        # Guarda só as variações; a pergunta original é reinserida na leitura
+        gravar_cache('expansoes', {cache_key: orjson.dumps(expanded_queries)})
+        limitar_cache('expansoes', EXPANSION_CACHE_MAX_ENTRIES)
+        
+        # Garante que a pergunta original esteja no início da lista
+        expanded_queries.insert(0, user_query)
+            
+        return expanded_queries
+    
+    except Exception as e:
+        # Se qualquer coisa der errado, retorna a pergunta original em uma lista.
+        print(f"Erro ao expandir a pergunta: {e}. Usando a pergunta original.")
+        return [user_query]
+
+async def expandir_e_embutir_pergunta(user_query):
+    """
+    Expande a pergunta com o Gemini e, EM PARALELO, calcula o vetor da pergunta original.
+    Depois embute apenas as variações geradas. Retorna (lista de perguntas, matriz de vetores),
+    com as linhas da matriz na mesma ordem da lista.
+    """
+    expanded_queries, original_vector = await asyncio.gather(
+        expand_query_with_gemini_async(user_query),
+        embed_queries_async([user_query])
+    )
+
+    # A pergunta original é sempre a primeira da lista e já foi embutida
+    variations = expanded_queries[1:]
+    if not variations:
+        return expanded_queries, original_vector
+
+    variation_vectors = await embed_queries_async(variations)
+    return expanded_queries, np.vstack([original_vector, variation_vectors])
+
+async def gerar_resposta_hipotetica_async(user_query):
+    """
+    HyDE: pede ao Gemini uma resposta curta (hipotética) para a pergunta. O texto dela se parece
+    mais com os trechos das transcrições do que a própria pergunta, o que melhora a busca.
+    A resposta fica no cache em disco (tabela de expansões). Retorna None em caso de erro.
+    """
+    cache_key = f"hyde\n{normalize_query(user_query)}"
+    cached = ler_cache('expansoes', [cache_key], EXPANSION_CACHE_TTL)
+    if cache_key in cached:
+        return orjson.loads(cached[cache_key])
+
+    try:
+        prompt = f"""
+        Você é um especialista em teologia e estudos bíblicos.
+        Responda brevemente (no máximo {HYDE_MAX_WORDS} palavras), em português, à pergunta abaixo,
+        como se o trecho fosse de um estudo bíblico em vídeo. Não use listas nem títulos.
+
+        Pergunta: "{user_query}"
+        """
+        response = await get_model().generate_content_async(prompt)
+        hypothetical_answer = response.text.strip()
+        if not hypothetical_answer:
+            return None
+
+        gravar_cache('expansoes', {cache_key: orjson.dumps(hypothetical_answer)})
+        limitar_cache('expansoes', EXPANSION_CACHE_MAX_ENTRIES)
+        return hypothetical_answer
+
+    except Exception as e:
+        print(f"Erro ao gerar a resposta hipotética: {e}. Usando só a pergunta original.")
+        return None
+
+async def embutir_pergunta_com_hyde(user_query):
+    """
+    Gera a resposta hipotética e, EM PARALELO, calcula o vetor da pergunta original.
+    A busca usa um único vetor: a média dos dois (ou só o da pergunta, se o HyDE falhar).
+    Retorna (textos usados, matriz de vetores com uma linha).
+    """
+    hypothetical_answer, query_vector = await asyncio.gather(
+        gerar_resposta_hipotetica_async(user_query),
+        embed_queries_async([user_query])
+    )
+    if hypothetical_answer is None:
+        return [user_query], query_vector
+
+    # A resposta hipotética faz o papel de um trecho do acervo: é embutida como documento
+    answer_vector = await embed_queries_async([hypothetical_answer], task_type="RETRIEVAL_DOCUMENT")
+    return [user_query, hypothetical_answer], np.vstack([query_vector, answer_vector]).mean(axis=0, keepdims=True)
+
+async def preparar_vetores_da_pergunta(user_query):
+    """Escolhe o preparo da pergunta conforme USE_QUERY_EXPANSION: expansão em variações ou HyDE."""
+    if USE_QUERY_EXPANSION:
+        return await expandir_e_embutir_pergunta(user_query)
+    return await embutir_pergunta_com_hyde(user_query)
+
+def buscar_chunks_relevantes(query_vectors, index, metadata, k=10):
+    """
+    Busca os k chunks mais relevantes para uma MATRIZ de vetores de perguntas e retorna
+    os metadados únicos dos chunks encontrados.
+    """
+    # 1. O FAISS exige float32 contíguo; os vetores já chegam assim, então não há cópia extra
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+
+    # Índices reconstruídos com menos dimensões (truncamento Matryoshka) usam só o início
+    # de cada vetor; o trecho truncado precisa ser normalizado de novo
+    truncated = query_vectors.shape[1] > index.d
+    if truncated:
+        query_vectors = np.ascontiguousarray(query_vectors[:, :index.d])
+
+    # Em índices de produto interno os vetores guardados estão normalizados,
+    # então as perguntas também precisam estar (produto interno = cosseno)
+    if truncated or index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(query_vectors)
+
+    # 2. Busca no FAISS por todos os vetores de uma vez
+    # O resultado 'indices' será uma lista de listas (uma para cada pergunta)
+    distances, indices = index.search(query_vectors, k)
+    
+    # 3. Junta os índices de todas as perguntas e remove duplicatas, tudo no NumPy
+    # -1 é um valor que o FAISS pode retornar se não encontrar vizinhos suficientes
+    flat_indices = indices.ravel()
+    unique_indices = np.unique(flat_indices[flat_indices != -1])
+
+    # 4. Retorna os metadados dos chunks únicos encontrados (uma única leitura em lote)
+    return list(metadata[unique_indices])
+
+def gerar_resposta_com_busca(query, chunks_relevantes):
+    """Gera uma resposta com base na busca, incluindo citações, entregando o texto em pedaços (streaming)."""
+    # Monta as partes em uma lista e junta uma única vez (evita concatenações repetidas de strings)
+    parts = ["\n\n--- DOCUMENTOS RELEVANTES PARA CONSULTA ---\n"]
+    parts.extend(
+        f"\nDOCUMENTO: {chunk['source_file']}\nCONTEÚDO:\n'''{chunk['text']}'''\n"
+        for chunk in chunks_relevantes
+    )
+    parts.append("\n--- FIM DOS DOCUMENTOS RELEVANTES ---\n")
+    contexto_formatado = "".join(parts)
+
+    prompt = f"""
+    Você é um assistente teológico especialista. Sua tarefa é responder à pergunta do usuário de forma detalhada e estruturada, utilizando EXCLUSIVAMENTE os trechos de texto fornecidos.
+
+    **Instruções Cruciais:**
+    1.  Sintetize uma resposta completa e coesa.
+    2.  Ao final de CADA frase que utilize informação de um documento, você DEVE citar o nome do arquivo correspondente usando o formato `[nome do arquivo.txt]`.
+    3.  Se o conteúdo não for suficiente, diga "Com base nos trechos fornecidos, não tenho informação suficiente para responder a essa pergunta.".
+    4.  Não crie uma seção de "Referências" no final. A citação deve estar no corpo do texto.
+
+    **PERGUNTA DO USUÁRIO:**
+    "{query}"
+
+    **DOCUMENTOS PARA CONSULTA:**
+    {contexto_formatado}
+
+    Agora, construa sua resposta seguindo todas as instruções.
+    """
+    try:
+        # Streaming: cada pedaço é entregue assim que o Gemini o gera
+        response = get_model().generate_content(prompt, stream=True)
+        for chunk in response:
+            yield chunk.text
+    except Exception as e:
+        yield f"Ocorreu um erro ao gerar a resposta: {e}"
@@ -0,0 +1,303 @@
+# lib/video.py
+"""Análise de vídeo individual: catálogo de vídeos, transcrições (com cache) e prompts de análise."""
+import asyncio
+import html
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import google.generativeai as genai
+import jinja2
+import orjson
+import streamlit as st
+from pytubefix import YouTube
+
+from lib.config import (
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_TEMPERATURE,
+    GEMINI_MAX_CONCURRENCY,
+    PROMPTS_DIR,
+    TRANSCRIPT_CACHE_TTL,
+    TRANSCRIPT_MAX_CHARS,
+    TRANSCRIPT_MAX_TOKENS,
+    TRANSCRIPT_PREFETCH_WORKERS,
+)
+from lib.cache import chaves_em_cache, gravar_cache, ler_cache
+from lib.gemini import get_model
+
+# Conteúdo de cada tag <text> do XML de legendas do YouTube
+CAPTION_TEXT_RE = re.compile(r'<text[^>]*>([^<]*)</text>')
+
+# Códigos das legendas aceitas, em ordem de preferência
+CAPTION_LANGUAGE_CODES = ('pt', 'pt-BR', 'a.pt')
+
+@st.cache_data
+def ler_catalogo_de_videos(filepath):
+    """
+    Lê o catálogo de vídeos (JSON) e monta a lista de vídeos ("videos"), a lista de títulos ("titles")
+    e um índice {título: vídeo} ("by_title"), tudo calculado uma única vez.
+    Erros são relançados (e não ficam no cache), então pode rodar na thread de aquecimento.
+    """
+    video_data = orjson.loads(Path(filepath).read_bytes())
+    return {
+        "videos": video_data,
+        "titles": [video['titulo'] for video in video_data],
+        "by_title": {video['titulo']: video for video in video_data},
+    }
+
+def load_video_data(filepath):
+    """Carrega os dados dos vídeos (do cache) e mostra na tela os erros de leitura. Retorna None em caso de erro."""
+    try:
+        return ler_catalogo_de_videos(filepath)
+    except FileNotFoundError:
+        st.error(f"ERRO: O arquivo de dados '{filepath}' não foi encontrado.")
+    except orjson.JSONDecodeError:
+        st.error(f"ERRO: O arquivo '{filepath}' não é um JSON válido.")
+    return None
+
+def baixar_transcricao(video_id):
+    """
+    Busca a transcrição de um vídeo, consultando primeiro o cache em disco
+    (que sobrevive a reinicializações do Streamlit Cloud) e só depois o YouTube.
+    Lança LookupError se o vídeo não tiver legendas em português utilizáveis.
+    Não usa nenhum elemento do Streamlit, então pode rodar em threads de fundo.
+    """
+    cached = ler_cache('transcricoes', [video_id], TRANSCRIPT_CACHE_TTL)
+    if video_id in cached:
+        return cached[video_id]
+
+    yt = YouTube(f"https://www.youtube.com/watch?v={video_id}")
+
+    # Prioriza a busca por legendas em português: manual, brasileira, depois automática.
+    # yt.captions monta a lista de legendas a cada acesso, então é lida uma única vez
+    captions = yt.captions
+    caption = next((captions[code] for code in CAPTION_LANGUAGE_CODES if code in captions), None)
+
+    # Se nenhuma legenda em português for encontrada
+    if not caption:
+        raise LookupError("Não foi possível encontrar legendas em português (manuais ou automáticas) para este vídeo.")
+
+    # As legendas vêm em formato XML, então precisamos processá-las
+    xml_captions = caption.xml_captions
+
+    # O XML das legendas é só uma sequência de <text ...>conteúdo</text>: uma regex pré-compilada
+    # extrai os conteúdos sem montar nenhuma árvore XML; as entidades (&amp; etc.) são decodificadas depois
+    transcript_lines = [line for line in CAPTION_TEXT_RE.findall(xml_captions) if line]
+
+    if not transcript_lines:
+        raise LookupError("A trilha de legenda foi encontrada, mas está vazia.")
+
+    transcript = html.unescape(" ".join(transcript_lines))
+    gravar_cache('transcricoes', {video_id: transcript})
+    return transcript
+
+@st.cache_data(ttl=TRANSCRIPT_CACHE_TTL, show_spinner=False)
+def _fetch_transcript(video_id):
+    """Camada em memória (st.cache_data) sobre baixar_transcricao."""
+    return baixar_transcricao(video_id)
+
+def prefetch_transcripts(video_ids, max_workers=TRANSCRIPT_PREFETCH_WORKERS):
+    """
+    Baixa em paralelo as transcrições que ainda não estão no cache em disco.
+    A busca é limitada por rede (o GIL é liberado durante as requisições), então threads bastam.
+    Retorna {video_id: mensagem de erro} para os vídeos que falharam.
+    """
+    # Só as chaves: os textos das transcrições já baixadas não precisam ser lidos
+    cached = chaves_em_cache('transcricoes', TRANSCRIPT_CACHE_TTL)
+    pending = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in cached]
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(baixar_transcricao, video_id): video_id for video_id in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future]] = str(e)
+    return errors
+
+@st.cache_resource
+def get_transcript_executor():
+    """Cria (uma única vez por processo) o pool que busca transcrições em segundo plano."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix='transcricao')
+
+def iniciar_busca_da_transcricao(url):
+    """
+    Dispara em segundo plano a busca da transcrição do vídeo selecionado, uma vez por troca de vídeo,
+    para que ela já esteja no cache em disco quando o usuário clicar em "Analisar".
+    Cada sessão mantém no máximo uma busca pendente: a do vídeo anterior é cancelada se ainda estiver na fila.
+    """
+    if st.session_state.get('transcript_prefetch_url') == url:
+        return
+    previous = st.session_state.get('transcript_prefetch_future')
+    if previous is not None:
+        # Só cancela o que ainda não começou; uma busca em andamento termina e vai para o cache
+        previous.cancel()
+    video_id = extract_video_id(url)
+    st.session_state['transcript_prefetch_url'] = url
+    st.session_state['transcript_prefetch_future'] = (
+        get_transcript_executor().submit(baixar_transcricao, video_id) if video_id else None
+    )
+
+def _aguardar_busca_da_transcricao(url):
+    """
+    Espera a busca em segundo plano iniciada para esta URL, se ela já tiver começado.
+    Se ainda estiver na fila (atrás de buscas de outras sessões), é cancelada e a busca é feita
+    diretamente. Uma falha da busca em segundo plano é relançada, em vez de repetir a busca.
+    """
+    if st.session_state.get('transcript_prefetch_url') != url:
+        return
+    # A busca é consumida uma única vez: um novo clique não relança um erro antigo
+    future = st.session_state.pop('transcript_prefetch_future', None)
+    if future is None or future.cancel():
+        return
+    future.result()
+
+# Cada ação da aba de vídeo usa um template Jinja2 da pasta de prompts
+ANALYSIS_TEMPLATE_FILES = {
+    "Análise de Expressões e Referências": 'analise_expressoes.j2',
+    "Resumo Inteligente do Vídeo": 'resumo_video.j2',
+}
+
+PARTIAL_SUMMARY_TEMPLATE_FILE = 'resumo_parcial.j2'
+
+# Configuração de geração da análise, criada uma única vez (temperatura baixa: respostas fiéis ao conteúdo)
+ANALYSIS_GENERATION_CONFIG = genai.types.GenerationConfig(temperature=ANALYSIS_TEMPERATURE)
+
+# Sem spinner, pois _summarize_chunk a chama fora da thread do script (no event loop)
+@st.cache_resource(show_spinner=False)
+def load_prompt_environment():
+    """Cria (uma única vez) o ambiente Jinja2; cada template é compilado no primeiro uso e reaproveitado."""
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(PROMPTS_DIR),
+        cache_size=-1,
+        autoescape=False,
+        trim_blocks=True,
+        lstrip_blocks=True
+    )
+
+def chunk_transcript(text, max_chars=TRANSCRIPT_MAX_CHARS):
+    """
+    Divide a transcrição em partes de até max_chars caracteres, sem quebrar palavras.
+    As legendas são unidas por espaços (não há parágrafos), então a divisão é feita por palavras.
+    """
+    chunks = []
+    current_words = []
+    current_len = 0
+    for word in text.split():
+        if current_words and current_len + 1 + len(word) > max_chars:
+            chunks.append(" ".join(current_words))
+            current_words = []
+            current_len = 0
+        current_len += len(word) + (1 if current_words else 0)
+        current_words.append(word)
+    if current_words:
+        chunks.append(" ".join(current_words))
+    return chunks
+
+async def _summarize_chunk(chunk, part, total, semaphore):
+    """Resume uma parte da transcrição, respeitando o limite de chamadas simultâneas."""
+    prompt = load_prompt_environment().get_template(PARTIAL_SUMMARY_TEMPLATE_FILE).render(
+        parte=part, total=total, trecho=chunk
+    )
+    async with semaphore:
+        response = await get_model().generate_content_async(prompt)
+    return f"[Parte {part}/{total}]\n{response.text.strip()}"
+
+async def summarize_long_transcript(transcript):
+    """
+    Map-reduce para transcrições longas: resume cada parte em paralelo (asyncio.gather,
+    com um semáforo limitando a concorrência) e devolve os resumos unidos, em ordem.
+    """
+    chunks = chunk_transcript(transcript)
+    semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    summaries = await asyncio.gather(*(
+        _summarize_chunk(chunk, i, len(chunks), semaphore) for i, chunk in enumerate(chunks, start=1)
+    ))
+    return "\n\n".join(summaries)
+
+TRANSCRIPT_OMISSION_MARKER = "…[trecho central omitido]…"
+
+def truncate_middle(text, max_tokens=TRANSCRIPT_MAX_TOKENS):
+    """
+    Limita o texto a max_tokens mantendo o início (40%) e o fim (40%) e omitindo o trecho central.
+    É a última proteção antes da análise, para quando o resumo por partes não reduziu o suficiente.
+    """
+    # Em português um token tem bem mais de 3 caracteres em média: abaixo desse limite o texto
+    # certamente cabe, e a contagem (uma chamada à API) é dispensada. Na prática, só uma
+    # transcrição completa cujo resumo por partes falhou chega a ser contada
+    if len(text) <= max_tokens * 3:
+        return text
+    try:
+        total_tokens = get_model().count_tokens(text).total_tokens
+    except Exception:
+        total_tokens = len(text) // 4  # estimativa (~4 caracteres por token) se a contagem falhar
+    if total_tokens <= max_tokens:
+        return text
+
+    # Converte o orçamento de tokens em caracteres, na proporção do próprio texto, sem cortar palavras
+    part_chars = int(len(text) * max_tokens / total_tokens * 0.4)
+    head = text[:part_chars].rsplit(' ', 1)[0]
+    tail = text[-part_chars:].split(' ', 1)[-1]
+    return f"{head} {TRANSCRIPT_OMISSION_MARKER} {tail}"
+
+def extract_video_id(url):
+    """
+    Extrai o ID de um vídeo do YouTube a partir das formas comuns de URL:
+    watch?v=ID, youtu.be/ID, /shorts/ID, /embed/ID e /v/ID. Retorna None se não encontrar.
+    """
+    parsed = urlparse(url)
+    if parsed.netloc.endswith('youtu.be'):
+        return parsed.path.lstrip('/') or None
+
+    video_id = parse_qs(parsed.query).get('v', [None])[0]
+    if video_id:
+        return video_id
+
+    # Formatos em que o ID é o último segmento do caminho (shorts, embed, v)
+    last_segment = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+    return last_segment if last_segment and last_segment != 'watch' else None
+
+def get_video_transcript(url):
+    """
+    Extrai a transcrição de um vídeo do YouTube usando pytubefix para evitar bloqueios de IP.
+    O resultado fica em cache (memória e disco), evitando buscas repetidas ao YouTube.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        st.error(f"ERRO: Não foi possível identificar o vídeo na URL '{url}'.")
+        return None
+
+    try:
+        # Reaproveita a busca iniciada ao escolher o vídeo; depois dela, a transcrição já está no cache em disco
+        _aguardar_busca_da_transcricao(url)
+        # Falhas lançam exceção e, por isso, não ficam guardadas no cache
+        return _fetch_transcript(video_id)
+
+    except LookupError as e:
+        st.error(f"ERRO: {e}")
+        st.warning("Verifique se o vídeo possui legendas em português no YouTube.")
+        return None
+    except Exception as e:
+        st.error(f"Ocorreu um erro inesperado ao tentar buscar as legendas com pytubefix: {e}")
+        st.info("Isso pode ser um problema com a biblioteca, a URL do vídeo ou uma restrição de acesso.")
+        return None
+
+def render_analysis_prompt(action, versiculo, transcript, resumida=False):
+    """Renderiza o prompt final da análise escolhida, com o versículo-chave e a transcrição."""
+    template = load_prompt_environment().get_template(ANALYSIS_TEMPLATE_FILES[action])
+    return template.render(versiculo=versiculo, transcript=transcript, resumida=resumida)
+
+def _analysis_cache_key(url, action):
+    """Chave do cache de análises: ID do vídeo + ação escolhida."""
+    return f"{extract_video_id(url)}|{action}"
+
+def ler_analise_em_cache(url, action):
+    """Retorna a análise já gerada para este vídeo e ação, ou None se não houver (ou tiver expirado)."""
+    key = _analysis_cache_key(url, action)
+    return ler_cache('analises', [key], ANALYSIS_CACHE_TTL).get(key)
+
+def salvar_analise_em_cache(url, action, analise):
+    """Guarda a análise gerada pelo Gemini para reaproveitá-la em cliques seguintes."""
+    gravar_cache('analises', {_analysis_cache_key(url, action): analise})
@@ -0,0 +1,50 @@
+# scripts/converter_metadados.py
+"""
+Converte os metadados dos chunks (lista de dicionários em pickle) para um
+arquivo Arrow IPC colunar.
+
+O app abre o arquivo Arrow via memory-map: a carga é praticamente instantânea
+e os textos não são materializados como objetos Python até serem usados.
+A coluna source_file é gravada com codificação de dicionário: cada nome de
+arquivo é guardado uma única vez e os chunks guardam só um id uint32.
+Enquanto o arquivo .arrow não existir, o app continua lendo o pickle.
+
+Uso (a partir da raiz do repositório):
+    python scripts/converter_metadados.py
+"""
+import argparse
+import pickle
+
+import pyarrow as pa
+
+PICKLE_PADRAO = 'chunks_mapeamento_gemini_txt_900.pkl'
+ARROW_PADRAO = 'chunks_mapeamento_gemini_txt_900.arrow'
+
+
+def converter_metadados(entrada, saida):
+    """Lê a lista de chunks do pickle e grava uma tabela Arrow (uma linha por chunk, na mesma ordem)."""
+    with open(entrada, 'rb') as f:
+        metadata = pickle.load(f)
+
+    tabela = pa.Table.from_pylist(metadata)
+    # Milhares de chunks repetem o mesmo nome de arquivo: ids uint32 + lista de nomes únicos.
+    # Na leitura, to_pylist()/as_py() devolvem a string, então o app não muda.
+    coluna = tabela.schema.get_field_index('source_file')
+    if coluna != -1:
+        fontes = tabela.column(coluna).dictionary_encode().cast(pa.dictionary(pa.uint32(), pa.string()))
+        tabela = tabela.set_column(coluna, 'source_file', fontes)
+    with pa.OSFile(saida, 'wb') as sink:
+        with pa.ipc.new_file(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+
+    print(f"{tabela.num_rows} chunks gravados em '{saida}' (colunas: {', '.join(tabela.column_names)}).")
+    return tabela
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entrada', default=PICKLE_PADRAO, help="Pickle com a lista de chunks.")
+    parser.add_argument('--saida', default=ARROW_PADRAO, help="Arquivo Arrow IPC de destino.")
+    args = parser.parse_args()
+
+    converter_metadados(args.entrada, args.saida)
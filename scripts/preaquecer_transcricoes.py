@@ -0,0 +1,43 @@
+# scripts/preaquecer_transcricoes.py
+"""
+Baixa em paralelo as transcrições de todos os vídeos do catálogo para o cache
+em disco. Assim a primeira análise de cada vídeo no app não espera o YouTube.
+
+Vídeos já presentes no cache (dentro do TTL) são ignorados, então o script
+pode ser executado novamente para completar o que faltou.
+
+Uso (a partir da raiz do repositório):
+    python scripts/preaquecer_transcricoes.py
+    python scripts/preaquecer_transcricoes.py --threads 4
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Permite importar o pacote lib ao executar o script diretamente
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+
+from lib.config import TRANSCRIPT_PREFETCH_WORKERS, VIDEO_JSON_FILE
+from lib.video import extract_video_id, prefetch_transcripts
+
+
+def preaquecer_transcricoes(catalogo, threads):
+    """Baixa as transcrições de todos os vídeos do catálogo e informa as falhas."""
+    videos = orjson.loads(Path(catalogo).read_bytes())
+    video_ids = [video_id for video_id in (extract_video_id(video['url']) for video in videos) if video_id]
+
+    erros = prefetch_transcripts(video_ids, max_workers=threads)
+    for video_id, erro in erros.items():
+        print(f"[falhou] {video_id}: {erro}")
+    print(f"{len(video_ids) - len(erros)} de {len(video_ids)} transcrições disponíveis no cache.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalogo', default=VIDEO_JSON_FILE, help="JSON com a lista de vídeos.")
+    parser.add_argument('--threads', type=int, default=TRANSCRIPT_PREFETCH_WORKERS, help="Downloads simultâneos.")
+    args = parser.parse_args()
+
+    preaquecer_transcricoes(args.catalogo, args.threads)
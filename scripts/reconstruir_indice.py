@@ -0,0 +1,102 @@
+# scripts/reconstruir_indice.py
+"""
+Reconstrói o banco vetorial FAISS em um índice de busca sublinear.
+
+O índice original é plano (IndexFlat), o que obriga cada busca a percorrer
+todos os vetores. Este script lê os vetores do índice plano e grava um novo
+índice HNSW com vetores em float16 (acervos pequenos) ou OPQ + IVF-PQ com
+quantizador HNSW (acervos grandes), mantendo a mesma ordem dos vetores, de
+modo que o arquivo de metadados continua válido.
+
+Por padrão os vetores são normalizados (norma L2 = 1) e o índice usa produto
+interno, que passa a ser equivalente à similaridade de cosseno. O app
+normaliza os vetores das perguntas quando o índice usa produto interno.
+
+Com --dimensao, os vetores são truncados às primeiras N dimensões e
+renormalizados (os embeddings do Gemini seguem o aprendizado Matryoshka, em
+que o início do vetor concentra a informação). O app trunca as perguntas para
+a mesma dimensão do índice automaticamente.
+
+A entrada precisa ser o índice plano original: os vetores de um índice já
+reconstruído (float16/PQ) voltam com perdas, então o script se recusa a lê-los.
+Por isso o novo índice é gravado em outro arquivo; para usá-lo no app, guarde o
+índice plano e troque os arquivos (ex.: mv novo.index banco_vetorial_...index).
+
+Uso (a partir da raiz do repositório, com o índice plano original):
+    python scripts/reconstruir_indice.py
+    python scripts/reconstruir_indice.py --fabrica "IVF256,PQ32" --saida novo.index
+    python scripts/reconstruir_indice.py --fabrica "SQ8" --metrica l2
+    python scripts/reconstruir_indice.py --dimensao 256
+"""
+import argparse
+import os
+
+import faiss
+import numpy as np
+
+INDICE_PADRAO = 'banco_vetorial_gemini_txt_900.index'
+SAIDA_PADRAO = 'banco_vetorial_gemini_txt_900_reconstruido.index'
+
+# Abaixo deste número de vetores o HNSW é mais rápido e não exige treinamento
+LIMITE_HNSW = 100_000
+
+
+def escolher_fabrica(num_vetores):
+    """Escolhe a string do index_factory de acordo com o tamanho do acervo."""
+    if num_vetores < LIMITE_HNSW:
+        return "HNSW32,SQfp16"
+    # Cerca de 4·√N listas (potência de 2, até 4096); o treino pede ~39 vetores por lista
+    num_listas = min(4096, 2 ** int(np.log2(4 * np.sqrt(num_vetores))))
+    return f"OPQ64_128,IVF{num_listas}_HNSW32,PQ64"
+
+
+def reconstruir_indice(entrada, saida, fabrica=None, metrica='ip', dimensao=None):
+    """Lê os vetores do índice plano, treina/popula o novo índice e o grava em disco."""
+    if os.path.abspath(saida) == os.path.abspath(entrada):
+        raise ValueError("A saída não pode sobrescrever a entrada: o índice plano é a única cópia exata dos vetores.")
+    indice_plano = faiss.read_index(entrada)
+    if not isinstance(indice_plano, faiss.IndexFlat):
+        raise ValueError(
+            f"'{entrada}' não é um índice plano (IndexFlat): seus vetores seriam reconstruídos com perdas. "
+            "Use o índice plano original como entrada."
+        )
+    vetores = np.ascontiguousarray(indice_plano.reconstruct_n(0, indice_plano.ntotal), dtype=np.float32)
+
+    # Truncamento Matryoshka: mantém só as primeiras dimensões e renormaliza
+    truncado = dimensao is not None and dimensao < vetores.shape[1]
+    if truncado:
+        vetores = np.ascontiguousarray(vetores[:, :dimensao])
+
+    if metrica == 'ip':
+        # Com vetores normalizados, o produto interno é a similaridade de cosseno
+        metric_type = faiss.METRIC_INNER_PRODUCT
+    else:
+        metric_type = faiss.METRIC_L2
+    if truncado or metrica == 'ip':
+        faiss.normalize_L2(vetores)
+
+    fabrica = fabrica or escolher_fabrica(indice_plano.ntotal)
+    novo_indice = faiss.index_factory(vetores.shape[1], fabrica, metric_type)
+
+    # IVF e PQ precisam aprender os centróides antes de receber os vetores
+    if not novo_indice.is_trained:
+        novo_indice.train(vetores)
+    novo_indice.add(vetores)
+
+    faiss.write_index(novo_indice, saida)
+    print(f"Índice '{fabrica}' com {novo_indice.ntotal} vetores gravado em '{saida}'.")
+    return novo_indice
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entrada', default=INDICE_PADRAO, help="Índice FAISS plano de origem.")
+    parser.add_argument('--saida', default=SAIDA_PADRAO, help="Arquivo do novo índice (não pode ser a entrada).")
+    parser.add_argument('--fabrica', default=None, help="String do faiss.index_factory (padrão: automático).")
+    parser.add_argument('--metrica', choices=('ip', 'l2'), default='ip',
+                        help="'ip' normaliza os vetores e usa produto interno (cosseno); 'l2' usa distância euclidiana.")
+    parser.add_argument('--dimensao', type=int, default=None,
+                        help="Trunca os vetores às primeiras N dimensões (ex.: 256); padrão: dimensão original.")
+    args = parser.parse_args()
+
+    reconstruir_indice(args.entrada, args.saida, args.fabrica, args.metrica, args.dimensao)